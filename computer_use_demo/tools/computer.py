@@ -1,22 +1,69 @@
 import asyncio
 import base64
+import functools
+import io
+import itertools
+import os
 import shlex
+import time
 from enum import StrEnum
 from pathlib import Path
 from typing import Literal, TypedDict
-from uuid import uuid4
 from anthropic.types.beta import BetaToolComputerUse20241022Param
+from PIL import Image
 from screeninfo import get_monitors
 
 from .base import BaseAnthropicTool, ToolError, ToolResult
 from .run import run
 import logging
 
+try:
+    from Quartz import (
+        CGEventCreate,
+        CGEventCreateKeyboardEvent,
+        CGEventCreateMouseEvent,
+        CGEventGetLocation,
+        CGEventKeyboardSetUnicodeString,
+        CGEventPost,
+        CGEventSetFlags,
+        CGEventSetIntegerValueField,
+        kCGEventFlagMaskAlternate,
+        kCGEventFlagMaskCommand,
+        kCGEventFlagMaskControl,
+        kCGEventFlagMaskShift,
+        kCGEventLeftMouseDown,
+        kCGEventLeftMouseDragged,
+        kCGEventLeftMouseUp,
+        kCGEventMouseMoved,
+        kCGEventRightMouseDown,
+        kCGEventRightMouseUp,
+        kCGHIDEventTap,
+        kCGMouseButtonLeft,
+        kCGMouseButtonRight,
+        kCGMouseEventClickState,
+    )
+
+    QUARTZ_AVAILABLE = True
+except ImportError:
+    # PyObjC is not installed; actions fall back to spawning cliclick/osascript.
+    QUARTZ_AVAILABLE = False
+
 OUTPUT_DIR = "/tmp/outputs"
+# Screenshots are kept in memory; set this to also write each one to OUTPUT_DIR.
+DEBUG_SAVE_SCREENSHOTS = False
+# Debug screenshots are numbered per process, not per tool, so the captures from
+# earlier turns (each of which builds a new ComputerTool) are not overwritten.
+DEBUG_SCREENSHOT_PREFIX = f"screenshot_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}"
+debug_screenshot_ids = itertools.count()
 
 TYPING_DELAY_MS = 12
 TYPING_GROUP_SIZE = 50
 
+# Quartz drags move in DRAG_STEPS dragged events, DRAG_STEP_DELAY seconds apart,
+# so that apps see a real drag rather than an instant down/up click
+DRAG_STEPS = 10
+DRAG_STEP_DELAY = 0.02
+
 MAC_SCALED_RES_HEIGHT = 662
 MAC_SCALED_RES_WIDTH = 1024
 XGA_RES_HEIGHT = 768
@@ -80,6 +127,25 @@ XDOTOOL_TO_APPLESCRIPT_KEYCODES = {
     "F5": 96,  "F6": 97,  "F7": 98,  "F8": 100,
     "F9": 101, "F10": 109, "F11": 103, "F12": 111,
     # (Add more if needed: F13-F16, etc.)
+
+    "space": 49,
+}
+
+# xdotool names for printable characters; these are pressed as the character
+# itself so that they follow the active keyboard layout
+XDOTOOL_TO_CHARACTERS = {
+    "equal": "=",
+    "plus": "+",
+    "minus": "-",
+    "bracketright": "]",
+    "bracketleft": "[",
+    "apostrophe": "'",
+    "semicolon": ";",
+    "backslash": "\\",
+    "comma": ",",
+    "slash": "/",
+    "period": ".",
+    "grave": "`",
 }
 
 XDOTOOL_TO_APPLESCRIPT_MODIFIERS = {
@@ -92,41 +158,169 @@ XDOTOOL_TO_APPLESCRIPT_MODIFIERS = {
     "meta":  "command down",
 }
 
-def press_key_applescript(keycode: int, modifiers: list[str]) -> str:
-    """Return an AppleScript snippet to press a given keycode with optional modifiers."""
-    # Convert your "cmd"/"ctrl"/"alt"/"shift" to AppleScript equivalents:
-    applescript_mods_map = {
-        "cmd": "command down",
-        "ctrl": "control down",
-        "alt": "option down",
-        "shift": "shift down",
+# Bound lookups for the per-key hot path
+applescript_keycode = XDOTOOL_TO_APPLESCRIPT_KEYCODES.get
+applescript_modifier = XDOTOOL_TO_APPLESCRIPT_MODIFIERS.get
+xdotool_character = XDOTOOL_TO_CHARACTERS.get
+
+##########################
+# Xdotool-to-Quartz Mapping
+##########################
+# Special keys are posted by the keycodes in XDOTOOL_TO_APPLESCRIPT_KEYCODES, which
+# do not depend on the keyboard layout; printable characters never use fixed keycodes.
+if QUARTZ_AVAILABLE:
+    XDOTOOL_TO_QUARTZ_FLAGS = {
+        "ctrl": kCGEventFlagMaskControl,
+        "control": kCGEventFlagMaskControl,
+        "alt": kCGEventFlagMaskAlternate,
+        "shift": kCGEventFlagMaskShift,
+        "super": kCGEventFlagMaskCommand,
+        "cmd": kCGEventFlagMaskCommand,
+        "meta": kCGEventFlagMaskCommand,
     }
+    quartz_flag = XDOTOOL_TO_QUARTZ_FLAGS.get
+
+    QUARTZ_MOUSE_BUTTONS = {
+        "left": (kCGEventLeftMouseDown, kCGEventLeftMouseUp, kCGMouseButtonLeft),
+        "right": (kCGEventRightMouseDown, kCGEventRightMouseUp, kCGMouseButtonRight),
+    }
+
+
+def quartz_cursor_position() -> tuple[int, int]:
+    """Return the current cursor location in screen points."""
+    location = CGEventGetLocation(CGEventCreate(None))
+    return round(location.x), round(location.y)
+
+
+def quartz_mouse_move(x: int, y: int) -> None:
+    """Move the cursor to (x, y) by posting a mouse-moved event."""
+    event = CGEventCreateMouseEvent(None, kCGEventMouseMoved, (x, y), kCGMouseButtonLeft)
+    CGEventPost(kCGHIDEventTap, event)
+
+
+def quartz_click(button: Literal["left", "right"], count: int = 1) -> None:
+    """Click `button` at the current cursor location `count` times."""
+    down_type, up_type, mouse_button = QUARTZ_MOUSE_BUTTONS[button]
+    position = quartz_cursor_position()
+    for click_state in range(1, count + 1):
+        for event_type in (down_type, up_type):
+            event = CGEventCreateMouseEvent(None, event_type, position, mouse_button)
+            CGEventSetIntegerValueField(event, kCGMouseEventClickState, click_state)
+            CGEventPost(kCGHIDEventTap, event)
+
+
+def quartz_mouse_event(event_type: int, position: tuple[int, int]) -> None:
+    """Post a single left-button mouse event at `position`."""
+    event = CGEventCreateMouseEvent(None, event_type, position, kCGMouseButtonLeft)
+    CGEventPost(kCGHIDEventTap, event)
+
+
+async def quartz_drag(x: int, y: int) -> None:
+    """Press the left button at the current cursor location, drag to (x, y) and release."""
+    start_x, start_y = quartz_cursor_position()
+    quartz_mouse_event(kCGEventLeftMouseDown, (start_x, start_y))
+    await asyncio.sleep(DRAG_STEP_DELAY)
+    for step in range(1, DRAG_STEPS + 1):
+        position = (
+            round(start_x + (x - start_x) * step / DRAG_STEPS),
+            round(start_y + (y - start_y) * step / DRAG_STEPS),
+        )
+        quartz_mouse_event(kCGEventLeftMouseDragged, position)
+        await asyncio.sleep(DRAG_STEP_DELAY)
+    quartz_mouse_event(kCGEventLeftMouseUp, (x, y))
+
+
+def quartz_key(keycode: int, modifiers: list[str]) -> None:
+    """Press and release a virtual keycode with optional xdotool-style modifiers."""
+    flags = 0
+    for m in modifiers:
+        flag = quartz_flag(m)
+        if flag is None:
+            logging.error(f"Unknown modifier '{m}' - ignoring")
+        else:
+            flags |= flag
+
+    for key_down in (True, False):
+        event = CGEventCreateKeyboardEvent(None, keycode, key_down)
+        CGEventSetFlags(event, flags)
+        CGEventPost(kCGHIDEventTap, event)
+
+
+def quartz_character(char: str) -> None:
+    """Press and release a key that types `char`, whatever the keyboard layout."""
+    for key_down in (True, False):
+        # The keycode is ignored once a unicode string is attached to the event
+        event = CGEventCreateKeyboardEvent(None, 0, key_down)
+        # The length is in UTF-16 code units, which differs from len() outside the BMP
+        CGEventKeyboardSetUnicodeString(event, len(char.encode("utf-16-le")) // 2, char)
+        CGEventSetFlags(event, 0)
+        CGEventPost(kCGHIDEventTap, event)
+
+
+def scale_screenshot(raw_png: bytes) -> memoryview:
+    """Downscale a full-resolution PNG to the scaled Mac size, pad it to XGA and re-encode it."""
+    image = Image.open(io.BytesIO(raw_png))
+    scaled = image.resize((MAC_SCALED_RES_WIDTH, MAC_SCALED_RES_HEIGHT), Image.BILINEAR)
+    # Pad the bottom with black so the image matches the XGA resolution the API expects
+    canvas = Image.new("RGB", (XGA_RES_WIDTH, XGA_RES_HEIGHT), "black")
+    canvas.paste(scaled, (0, 0))
+
+    buffer = io.BytesIO()
+    canvas.save(buffer, "PNG", compress_level=1)
+    # A view over the buffer avoids copying the encoded PNG out of it
+    return buffer.getbuffer()
+
+
+def encode_screenshot(raw_png: bytes) -> tuple[memoryview, str]:
+    """Scale a full-resolution PNG and return it with its base64 encoding."""
+    png = scale_screenshot(raw_png)
+    return png, base64.b64encode(png).decode("ascii")
+
+
+def applescript_using_clause(modifiers: list[str]) -> str:
+    """Return the ' using {...}' clause for xdotool-style modifiers, or '' if none are recognized."""
     # Filter out any modifiers not recognized
-    applescript_mods = [applescript_mods_map[m] for m in modifiers if m in applescript_mods_map]
-    if applescript_mods:
-        mods_str = " using {" + ", ".join(applescript_mods) + "}"
-    else:
-        mods_str = ""
-    
-    return f'tell application "System Events" to key code {keycode}{mods_str}'
+    mods = ", ".join(filter(None, map(applescript_modifier, modifiers)))
+    return f" using {{{mods}}}" if mods else ""
+
+def press_key_applescript(keycode: int, modifiers: list[str]) -> str:
+    """Return an AppleScript snippet to press a given keycode with optional modifiers."""
+    return f'tell application "System Events" to key code {keycode}{applescript_using_clause(modifiers)}'
 
 def press_character_applescript(char: str, modifiers: list[str]) -> str:
     """Return an AppleScript snippet to press a character (e.g. 'a') with optional modifiers."""
-    applescript_mods_map = {
-        "cmd": "command down",
-        "ctrl": "control down",
-        "alt": "option down",
-        "shift": "shift down",
-    }
-    applescript_mods = [applescript_mods_map[m] for m in modifiers if m in applescript_mods_map]
-    if applescript_mods:
-        mods_str = " using {" + ", ".join(applescript_mods) + "}"
-    else:
-        mods_str = ""
-    
     # If char is a double quote, we need to escape it for AppleScript
     safe_char = char.replace('"', '\\"')
-    return f'tell application "System Events" to keystroke "{safe_char}"{mods_str}'
+    return f'tell application "System Events" to keystroke "{safe_char}"{applescript_using_clause(modifiers)}'
+
+@functools.cache
+def primary_monitor():
+    """Return the primary monitor, queried once per process."""
+    try:
+        return get_monitors()[0]
+    except IndexError:
+        # screeninfo returns no monitors when there is no display (e.g. headless CI)
+        raise ToolError("No monitor found; the computer tool requires a display") from None
+
+@functools.cache
+def debug_output_dir() -> Path:
+    """Return OUTPUT_DIR, creating it on the first debug screenshot."""
+    output_dir = Path(OUTPUT_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir
+
+# cliclick commands and Quartz (button, click count) pairs for each click action
+CLICLICK_CLICK_ARGS = {
+    "left_click": "c:.",
+    "right_click": "rc:.",
+    "double_click": "dc:.",
+}
+
+QUARTZ_CLICKS = {
+    "left_click": ("left", 1),
+    "right_click": ("right", 1),
+    "double_click": ("left", 2),
+}
 
 class ComputerTool(BaseAnthropicTool):
     """
@@ -139,29 +333,46 @@ class ComputerTool(BaseAnthropicTool):
     width: int
     height: int
 
-    _screenshot_delay = 2.0
+    # Screenshots are polled every _settle_interval seconds after an action until
+    # two consecutive frames match, giving up after _settle_timeout seconds.
+    _settle_timeout = 1.0
+    _settle_interval = 0.05
     _scaling_enabled = True
 
     @property
     def options(self) -> ComputerToolOptions:
-        width, height = self.scale_coordinates(
-            ScalingSource.COMPUTER, self.width, self.height
-        )
-        return {
-            "display_width_px": width,
-            "display_height_px": height,
-        }
+        return self._options
 
     def to_params(self) -> BetaToolComputerUse20241022Param:
-        return {"name": self.name, "type": self.api_type, **self.options}
+        return self._params
 
     def __init__(self):
         super().__init__()
 
-        monitor = get_monitors()[0]
+        monitor = primary_monitor()
         self.width = monitor.width
         self.height = monitor.height
 
+        # The display size is fixed for the lifetime of the tool, so the scale
+        # factors and the params derived from them are computed once here.
+        self._sx = MAC_SCALED_RES_WIDTH / self.width
+        self._sy = MAC_SCALED_RES_HEIGHT / self.height
+        self._inv_sx = 1.0 / self._sx
+        self._inv_sy = 1.0 / self._sy
+
+        width, height = self.scale_coordinates(
+            ScalingSource.COMPUTER, self.width, self.height
+        )
+        self._options: ComputerToolOptions = {
+            "display_width_px": width,
+            "display_height_px": height,
+        }
+        self._params: BetaToolComputerUse20241022Param = {
+            "name": self.name,
+            "type": self.api_type,
+            **self._options,
+        }
+
     async def __call__(
         self,
         *,
@@ -170,133 +381,196 @@ class ComputerTool(BaseAnthropicTool):
         coordinate: tuple[int, int] | None = None,
         **kwargs,
     ):
-        if action in ("mouse_move", "left_click_drag"):
-            if coordinate is None:
-                raise ToolError(f"coordinate is required for {action}")
-            if text is not None:
-                raise ToolError(f"text is not accepted for {action}")
-            if not isinstance(coordinate, list) or len(coordinate) != 2:
-                raise ToolError(f"{coordinate} must be a tuple of length 2")
-            if not all(isinstance(i, int) and i >= 0 for i in coordinate):
-                raise ToolError(f"{coordinate} must be a tuple of non-negative ints")
-
-            x, y = self.scale_coordinates(
-                ScalingSource.API, coordinate[0], coordinate[1]
-            )
-
-            if action == "mouse_move":
-                return await self.shell(f"cliclick m:{x},{y}")
-            elif action == "left_click_drag":
-                await self.shell(f"cliclick dd:.")
-                await self.shell(f"cliclick m:{x},{y}")
-                return await self.shell(f"cliclick du:.")
-
-        if action in ("key", "type"):
-            if text is None:
-                raise ToolError(f"text is required for {action}")
-            if coordinate is not None:
-                raise ToolError(f"coordinate is not accepted for {action}")
-            if not isinstance(text, str):
-                raise ToolError(output=f"{text} must be a string")
-
-            if action == "key":
-                parts = text.split('+')
-                # Last item is the "main" key, the rest are modifiers
-                key = parts[-1]
-                raw_mods = parts[:-1]
-
-                # Convert xdotool-style modifiers to AppleScript strings
-                applescript_mods = []
-                for m in raw_mods:
-                    if m in XDOTOOL_TO_APPLESCRIPT_MODIFIERS:
-                        applescript_mods.append(XDOTOOL_TO_APPLESCRIPT_MODIFIERS[m])
-                    else:
-                        logging.error(f"Unknown modifier '{m}' - ignoring")
-
-                # Decide if this is a "special key" (arrow, Return, etc.):
-                if key in XDOTOOL_TO_APPLESCRIPT_KEYCODES:
-                    # It's a known special key => use key code
-                    keycode = XDOTOOL_TO_APPLESCRIPT_KEYCODES[key]
-                    applescript_cmd = press_key_applescript(keycode, applescript_mods)
-                else:
-                    # Assume it's a normal character (like 'a', 'b', '1', '-', etc.)
-                    # We'll press it using keystroke
-                    applescript_cmd = press_character_applescript(key, applescript_mods)
-
-                if not applescript_cmd:
-                    raise ToolError(f"Cannot execute key '{text}'. Please try a different method.")
-                
-                return await self.shell(f'osascript -e \'{applescript_cmd}\'')
-                                
-            elif action == "type":
-                result = await self.shell(f'cliclick t:{text}', take_screenshot=False)
-                screenshot_base64 = (await self.screenshot()).base64_image
-                return ToolResult(
-                    output=result.output,
-                    error=result.error,
-                    base64_image=screenshot_base64,
-                )
-
-        if action in (
-            "left_click",
-            "right_click",
-            "double_click",
-            "middle_click",
-            "screenshot",
-            "cursor_position",
-        ):
-            if text is not None:
-                raise ToolError(f"text is not accepted for {action}")
-            if coordinate is not None:
-                raise ToolError(f"coordinate is not accepted for {action}")
-
-            if action == "screenshot":
-                return await self.screenshot()
-            elif action == "cursor_position":
-                result = await self.shell("cliclick p:", take_screenshot=False)
-                output = result.output.strip() or ""
-                x_int, y_int = map(int, output.split(","))
-                x, y = self.scale_coordinates(
-                    ScalingSource.COMPUTER,
-                    x_int,
-                    y_int,
-                )
-                return result.replace(output=f'X={x},Y={y}')
-            else:
-                if action == "middle_click":
-                    logging.error('Middle click leveraged')
-                    return ToolResult(error="Middle click is not supported currently.")
-                click_arg = {
-                    "left_click": "c:.",
-                    "right_click": "rc:.",
-                    # "middle_click": "",
-                    "double_click": "dc:.",
-                }[action]
-                return await self.shell(f"cliclick {click_arg}")
-
-        raise ToolError(f"Invalid action: {action}")
+        handler = self._HANDLERS.get(action)
+        if handler is None:
+            raise ToolError(f"Invalid action: {action}")
+        return await handler(self, action, text, coordinate)
+
+    def _validate_coordinate(
+        self, action: Action, text: str | None, coordinate: tuple[int, int] | None
+    ) -> tuple[int, int]:
+        """Validate the arguments of a coordinate action and return the coordinate in screen space."""
+        if coordinate is None:
+            raise ToolError(f"coordinate is required for {action}")
+        if text is not None:
+            raise ToolError(f"text is not accepted for {action}")
+        try:
+            x, y = coordinate
+        except (TypeError, ValueError):
+            raise ToolError(f"{coordinate} must be a tuple of length 2") from None
+        if type(x) is not int or type(y) is not int or x < 0 or y < 0:
+            raise ToolError(f"{coordinate} must be a tuple of non-negative ints")
+
+        return self.scale_coordinates(ScalingSource.API, x, y)
+
+    @staticmethod
+    def _validate_text(
+        action: Action, text: str | None, coordinate: tuple[int, int] | None
+    ) -> str:
+        """Validate the arguments of a text action and return the text."""
+        if text is None:
+            raise ToolError(f"text is required for {action}")
+        if coordinate is not None:
+            raise ToolError(f"coordinate is not accepted for {action}")
+        if not isinstance(text, str):
+            raise ToolError(f"{text} must be a string")
+        return text
+
+    @staticmethod
+    def _validate_no_args(
+        action: Action, text: str | None, coordinate: tuple[int, int] | None
+    ) -> None:
+        """Validate that an action received neither text nor a coordinate."""
+        if text is not None:
+            raise ToolError(f"text is not accepted for {action}")
+        if coordinate is not None:
+            raise ToolError(f"coordinate is not accepted for {action}")
+
+    async def _mouse_move(self, action, text, coordinate):
+        x, y = self._validate_coordinate(action, text, coordinate)
+        if QUARTZ_AVAILABLE:
+            quartz_mouse_move(x, y)
+            return await self.settle_and_screenshot()
+        return await self.shell(f"cliclick m:{x},{y}")
+
+    async def _left_click_drag(self, action, text, coordinate):
+        x, y = self._validate_coordinate(action, text, coordinate)
+        if QUARTZ_AVAILABLE:
+            await quartz_drag(x, y)
+            return await self.settle_and_screenshot()
+        await self.shell(f"cliclick dd:.", take_screenshot=False)
+        await self.shell(f"cliclick m:{x},{y}", take_screenshot=False)
+        return await self.shell(f"cliclick du:.")
+
+    async def _key(self, action, text, coordinate):
+        text = self._validate_text(action, text, coordinate)
+        parts = text.split('+')
+        # Last item is the "main" key, the rest are modifiers
+        key = xdotool_character(parts[-1], parts[-1])
+        raw_mods = parts[:-1]
+        if not key:
+            raise ToolError(f"No key given in '{text}'; use 'plus' for the + key")
+
+        # Decide if this is a "special key" (arrow, Return, etc.):
+        keycode = applescript_keycode(key)
+
+        if QUARTZ_AVAILABLE:
+            if keycode is not None:
+                quartz_key(keycode, raw_mods)
+                return await self.settle_and_screenshot()
+            if not raw_mods:
+                quartz_character(key)
+                return await self.settle_and_screenshot()
+            # Shortcuts on characters (e.g. cmd+z) go through AppleScript's keystroke
+            # below, which finds the character's key in the active layout
+
+        for m in raw_mods:
+            if applescript_modifier(m) is None:
+                logging.error(f"Unknown modifier '{m}' - ignoring")
+
+        if keycode is not None:
+            # It's a known special key => use key code
+            applescript_cmd = press_key_applescript(keycode, raw_mods)
+        else:
+            # Assume it's a normal character (like 'a', 'b', '1', '-', etc.)
+            # We'll press it using keystroke
+            applescript_cmd = press_character_applescript(key, raw_mods)
+
+        if not applescript_cmd:
+            raise ToolError(f"Cannot execute key '{text}'. Please try a different method.")
+
+        return await self.shell(f"osascript -e {shlex.quote(applescript_cmd)}")
+
+    async def _type(self, action, text, coordinate):
+        text = self._validate_text(action, text, coordinate)
+        # Type in TYPING_GROUP_SIZE chunks separated by cliclick's own w: wait
+        # command, so the whole text goes through a single cliclick invocation
+        commands = f" w:{TYPING_DELAY_MS} ".join(
+            shlex.quote(f"t:{text[i:i + TYPING_GROUP_SIZE]}")
+            # max(..., 1) still sends a single empty t: for empty text
+            for i in range(0, max(len(text), 1), TYPING_GROUP_SIZE)
+        )
+        # cliclick only exits once the text is typed, so a single
+        # screenshot is taken instead of polling for the UI to settle
+        result = await self.shell(f"cliclick {commands}", take_screenshot=False)
+        screenshot_base64 = (await self.screenshot()).base64_image
+        return ToolResult(
+            output=result.output,
+            error=result.error,
+            base64_image=screenshot_base64,
+        )
+
+    async def _click(self, action, text, coordinate):
+        self._validate_no_args(action, text, coordinate)
+        if QUARTZ_AVAILABLE:
+            quartz_click(*QUARTZ_CLICKS[action])
+            return await self.settle_and_screenshot()
+        return await self.shell(f"cliclick {CLICLICK_CLICK_ARGS[action]}")
+
+    async def _middle_click(self, action, text, coordinate):
+        self._validate_no_args(action, text, coordinate)
+        logging.error('Middle click leveraged')
+        return ToolResult(error="Middle click is not supported currently.")
+
+    async def _screenshot(self, action, text, coordinate):
+        self._validate_no_args(action, text, coordinate)
+        return await self.screenshot()
+
+    async def _cursor_position(self, action, text, coordinate):
+        self._validate_no_args(action, text, coordinate)
+        if QUARTZ_AVAILABLE:
+            result = ToolResult()
+            x_int, y_int = quartz_cursor_position()
+        else:
+            result = await self.shell("cliclick p:", take_screenshot=False)
+            output = result.output.strip() or ""
+            x_int, y_int = map(int, output.split(","))
+        x, y = self.scale_coordinates(
+            ScalingSource.COMPUTER,
+            x_int,
+            y_int,
+        )
+        return result.replace(output=f'X={x},Y={y}')
+
+    _HANDLERS = {
+        "mouse_move": _mouse_move,
+        "left_click_drag": _left_click_drag,
+        "key": _key,
+        "type": _type,
+        "left_click": _click,
+        "right_click": _click,
+        "double_click": _click,
+        "middle_click": _middle_click,
+        "screenshot": _screenshot,
+        "cursor_position": _cursor_position,
+    }
 
     async def screenshot(self):
         """Take a screenshot of the current screen and return the base64 encoded image."""
-        output_dir = Path(OUTPUT_DIR)
-        output_dir.mkdir(parents=True, exist_ok=True)
-        path = output_dir / f"screenshot_{uuid4().hex}.png"
-
-        result = await self.shell(f'screencapture -x {path}', take_screenshot=False)
-        await self.shell(
-            f'magick {path} \
-                -resize {MAC_SCALED_RES_WIDTH}x{MAC_SCALED_RES_HEIGHT} \
-                -gravity north \
-                -background black \
-                -extent {XGA_RES_WIDTH}x{XGA_RES_HEIGHT} \
-                {path}', take_screenshot=False
+        # screencapture writes the PNG to its stdout and the scaling is done
+        # in-process, so nothing touches the disk.
+        process = await asyncio.create_subprocess_exec(
+            "screencapture",
+            "-x",
+            "-t",
+            "png",
+            "/dev/stdout",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
+        stdout, stderr = await process.communicate()
+        if process.returncode or not stdout:
+            raise ToolError(f"Failed to take screenshot: {stderr.decode()}")
+
+        # Resizing, PNG encoding and base64 encoding run on a worker thread so
+        # they do not stall other coroutines on the event loop
+        png, base64_image = await asyncio.to_thread(encode_screenshot, stdout)
 
-        if path.exists():
-            return result.replace(
-                base64_image=base64.b64encode(path.read_bytes()).decode()
-            )
-        raise ToolError(f"Failed to take screenshot: {result.error}")
+        if DEBUG_SAVE_SCREENSHOTS:
+            path = debug_output_dir() / f"{DEBUG_SCREENSHOT_PREFIX}_{next(debug_screenshot_ids)}.png"
+            path.write_bytes(png)
+
+        return ToolResult(base64_image=base64_image)
 
     async def shell(self, command: str, take_screenshot=True) -> ToolResult:
         """Run a shell command and return the output, error, and optionally a screenshot."""
@@ -306,12 +580,24 @@ class ComputerTool(BaseAnthropicTool):
         base64_image = None
 
         if take_screenshot:
-            # delay to let things settle before taking a screenshot
-            await asyncio.sleep(self._screenshot_delay)
-            base64_image = (await self.screenshot()).base64_image
+            base64_image = (await self.settle_and_screenshot()).base64_image
 
         return ToolResult(output=stdout, error=stderr, base64_image=base64_image)
 
+    async def settle_and_screenshot(self) -> ToolResult:
+        """Wait for the UI to settle after an action and return a screenshot."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._settle_timeout
+        previous = None
+        while True:
+            await asyncio.sleep(self._settle_interval)
+            current = await self.screenshot()
+            if previous is not None and current.base64_image == previous.base64_image:
+                return current
+            if loop.time() >= deadline:
+                return current
+            previous = current
+
     def scale_coordinates(self, source: ScalingSource, x: int, y: int):
         """Scale coordinates between actual screen resolution and target scaled resolution.
         Handles conversion between actual Mac resolution (1728x1117), 
@@ -336,20 +622,17 @@ class ComputerTool(BaseAnthropicTool):
         Returns:
             tuple[int, int]: The scaled (x, y) coordinates
         """
-        screen_to_scaled_x = MAC_SCALED_RES_WIDTH / self.width
-        screen_to_scaled_y = MAC_SCALED_RES_HEIGHT / self.height
-
         if source == ScalingSource.API:
             if x > MAC_SCALED_RES_WIDTH or y > MAC_SCALED_RES_HEIGHT:
                 raise ToolError(f'Coordinates {x}, {y} are out of bounds')
                 
-            actual_x = round(x / screen_to_scaled_x)
-            actual_y = round(y / screen_to_scaled_y)
+            actual_x = round(x * self._inv_sx)
+            actual_y = round(y * self._inv_sy)
             
             return actual_x, actual_y
         
         else:  # ScalingSource.COMPUTER               
-            scaled_x = round(x * screen_to_scaled_x)
-            scaled_y = round(y * screen_to_scaled_y)
+            scaled_x = round(x * self._sx)
+            scaled_y = round(y * self._sy)
             
             return scaled_x, scaled_y